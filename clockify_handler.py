@@ -1,6 +1,71 @@
-import requests
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+import asyncio
+import calendar
+import httpx
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Optional, Dict, List, Tuple
+
+_ENTRIES_CACHE_SIZE = 16  # Time-entry ranges remembered for conditional GETs
+_MAX_RETRIES = 3
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_MAX_RETRY_AFTER = 60.0  # Cap on how long a Retry-After header can make us wait
+
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+def _new_project_totals() -> Dict:
+    return {"total_time": 0, "entries": []}
+
+def _new_day_totals() -> Dict:
+    return {"total_time": 0, "projects": defaultdict(_new_project_totals)}
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds to wait"""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def _wall_clock_us(dt: datetime) -> int:
+    """Microseconds since the epoch for dt's wall-clock fields, read as if they were UTC"""
+    return calendar.timegm(dt.timetuple()) * 1_000_000 + dt.microsecond
+
+@lru_cache(maxsize=1 << 15)
+def _to_epoch(ts: str) -> Tuple[int, int]:
+    """Parse a Clockify timestamp to (epoch µs, UTC offset s)
+
+    Memoized, since start/end strings repeat across entries and reports.
+    Naive timestamps are read as UTC wall-clock time, so durations and
+    weekdays never depend on the host's timezone or DST rules.
+    """
+    if ts[-1:] == "Z":
+        if len(ts) == 20:
+            # Fast path for Clockify's usual "YYYY-MM-DDTHH:MM:SSZ"
+            return calendar.timegm((
+                int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+                int(ts[11:13]), int(ts[14:16]), int(ts[17:19]), 0, 0, 0
+            )) * 1_000_000, 0
+        # Clockify times are UTC, so parse the fields without building an offset object
+        return _wall_clock_us(datetime.fromisoformat(ts[:-1])), 0
+    dt = datetime.fromisoformat(ts)
+    offset = dt.utcoffset()
+    if offset is None:
+        return _wall_clock_us(dt), 0
+    offset_s = int(offset.total_seconds())
+    return _wall_clock_us(dt) - offset_s * 1_000_000, offset_s
+
+def _duration(entry: Dict) -> int:
+    """Microseconds between an entry's start and end"""
+    interval = entry["timeInterval"]
+    return _to_epoch(interval["end"])[0] - _to_epoch(interval["start"])[0]
 
 class ClockifyHandler:
     def __init__(self, api_key: Optional[str] = None):
@@ -9,50 +74,141 @@ class ClockifyHandler:
         self.headers = {"X-Api-Key": api_key} if api_key else {}
         self.workspace_id = None
         self.user_id = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._setup_task: Optional["asyncio.Future[bool]"] = None  # In-flight setup shared by concurrent callers
+        # (start, end) -> (conditional request headers, entries returned then)
+        self._entries_cache: Dict[Tuple[str, str], Tuple[Dict[str, str], List[Dict]]] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create the shared, keep-alive HTTP/2 client"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=self.headers,
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30)
+            )
+        return self._client
 
-    def setup(self) -> bool:
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _send_get(
+        self,
+        url: str,
+        params: Optional[Dict],
+        headers: Optional[Dict],
+        semaphore: Optional[asyncio.Semaphore]
+    ) -> httpx.Response:
+        """Send a single GET, holding semaphore (if given) only for the request itself"""
+        if semaphore is None:
+            return await self._get_client().get(url, params=params, headers=headers)
+        async with semaphore:
+            return await self._get_client().get(url, params=params, headers=headers)
+
+    async def _get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Tuple[int, Any, httpx.Headers]:
+        """GET a URL and return (status, decoded JSON or None, response headers), retrying transient failures"""
+        for attempt in range(_MAX_RETRIES):
+            last_attempt = attempt == _MAX_RETRIES - 1
+            delay = 0.5 * 2 ** attempt  # Exponential backoff
+            try:
+                response = await self._send_get(url, params, headers, semaphore)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in _RETRY_STATUSES or last_attempt:
+                    data = response.json() if response.status_code == 200 else None
+                    return response.status_code, data, response.headers
+                # Honour the server's rate-limit hint when it gives one
+                retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    delay = min(retry_after, _MAX_RETRY_AFTER)
+            await asyncio.sleep(delay)
+        raise RuntimeError(f"GET {url} failed after {_MAX_RETRIES} attempts")
+
+    async def setup(self, semaphore: Optional[asyncio.Semaphore] = None) -> bool:
         """Initialize Clockify connection and get workspace ID"""
         if not self.api_key:
             return False
-            
+        if self.workspace_id and self.user_id:
+            return True  # Already set up, skip the round-trips
+
+        # Concurrent callers wait on the same in-flight setup instead of repeating it
+        if self._setup_task is None:
+            self._setup_task = asyncio.ensure_future(self._setup(semaphore))
+        return await asyncio.shield(self._setup_task)
+
+    async def _setup(self, semaphore: Optional[asyncio.Semaphore]) -> bool:
         try:
-            # Get user info
-            response = requests.get(f"{self.base_url}/user", headers=self.headers)
-            if response.status_code == 200:
-                self.user_id = response.json().get("id")
-                
-                # Get workspace
-                response = requests.get(f"{self.base_url}/workspaces", headers=self.headers)
-                if response.status_code == 200:
-                    workspaces = response.json()
-                    if workspaces:
-                        self.workspace_id = workspaces[0]["id"]  # Use first workspace
-                        return True
+            # User info and workspaces are independent, so fetch them together
+            (user_status, user, _), (ws_status, workspaces, _) = await asyncio.gather(
+                self._get_json(f"{self.base_url}/user", semaphore=semaphore),
+                self._get_json(f"{self.base_url}/workspaces", semaphore=semaphore)
+            )
+            if user_status == 200 and ws_status == 200 and workspaces:
+                self.user_id = user.get("id")
+                self.workspace_id = workspaces[0]["id"]  # Use first workspace
+                return True
             return False
         except Exception as e:
             print(f"Error setting up Clockify: {e}")
             return False
+        finally:
+            self._setup_task = None  # Let a failed setup be retried by the next call
+
+    async def get_time_entries(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[Dict]:
+        """Get time entries between dates
 
-    def get_time_entries(self, start_date: datetime, end_date: datetime) -> List[Dict]:
-        """Get time entries between dates"""
+        The entry dicts may be shared with the conditional-GET cache, so treat them as read-only.
+        """
         if not all([self.api_key, self.workspace_id, self.user_id]):
             return []
 
         try:
+            key = (start_date.isoformat() + "Z", end_date.isoformat() + "Z")
             params = {
-                "start": start_date.isoformat() + "Z",
-                "end": end_date.isoformat() + "Z",
+                "start": key[0],
+                "end": key[1],
                 "user": self.user_id
             }
+            cached = self._entries_cache.get(key)
             
-            response = requests.get(
+            status, entries, response_headers = await self._get_json(
                 f"{self.base_url}/workspaces/{self.workspace_id}/user/{self.user_id}/time-entries",
-                headers=self.headers,
-                params=params
+                params=params,
+                headers=cached[0] if cached else None,
+                semaphore=semaphore
             )
-            
-            if response.status_code == 200:
-                return response.json()
+            if status == 304 and cached:
+                return list(cached[1])  # Nothing changed since the last poll
+            if status == 200:
+                self._entries_cache.pop(key, None)
+                # Only revalidate with validators the server actually sent
+                validators = {}
+                if "ETag" in response_headers:
+                    validators["If-None-Match"] = response_headers["ETag"]
+                if "Last-Modified" in response_headers:
+                    validators["If-Modified-Since"] = response_headers["Last-Modified"]
+                if validators:
+                    if len(self._entries_cache) >= _ENTRIES_CACHE_SIZE:
+                        del self._entries_cache[next(iter(self._entries_cache))]  # Drop the oldest range
+                    self._entries_cache[key] = (validators, list(entries))
+                return entries
             return []
         except Exception as e:
             print(f"Error getting time entries: {e}")
@@ -63,43 +219,39 @@ class ClockifyHandler:
         if not entries:
             return "No time entries recorded for today."
             
-        total_duration = timedelta()
-        projects = {}
+        total_duration = 0
+        projects: Dict[str, Dict] = defaultdict(_new_project_totals)
         
         for entry in entries:
-            start_time = datetime.fromisoformat(entry["timeInterval"]["start"].replace("Z", "+00:00"))
-            end_time = datetime.fromisoformat(entry["timeInterval"]["end"].replace("Z", "+00:00"))
-            duration = end_time - start_time
+            duration = _duration(entry)
             
-            project = entry.get("projectName", "No Project")
+            project_totals = projects[entry.get("projectName", "No Project")]
             description = entry.get("description", "No description")
             
-            if project not in projects:
-                projects[project] = {
-                    "total_time": timedelta(),
-                    "entries": []
-                }
-            
-            projects[project]["total_time"] += duration
-            projects[project]["entries"].append({
+            project_totals["total_time"] += duration
+            project_totals["entries"].append({
                 "description": description,
                 "duration": duration
             })
             total_duration += duration
 
         # Generate markdown report
-        report = "## Daily Time Report\n\n"
-        report += f"Total time tracked: {self._format_duration(total_duration)}\n\n"
+        parts = [
+            "## Daily Time Report\n\n",
+            f"Total time tracked: {self._format_duration(total_duration)}\n\n"
+        ]
         
         for project, data in projects.items():
-            report += f"### {project}\n"
-            report += f"Total: {self._format_duration(data['total_time'])}\n\n"
-            report += "Activities:\n"
-            for entry in data["entries"]:
-                report += f"- {entry['description']} ({self._format_duration(entry['duration'])})\n"
-            report += "\n"
+            parts.append(f"### {project}\n")
+            parts.append(f"Total: {self._format_duration(data['total_time'])}\n\n")
+            parts.append("Activities:\n")
+            parts.extend(
+                f"- {entry['description']} ({self._format_duration(entry['duration'])})\n"
+                for entry in data["entries"]
+            )
+            parts.append("\n")
             
-        return report
+        return "".join(parts)
 
     def generate_weekly_report(self, entries: List[Dict]) -> str:
         """Generate weekly markdown report from time entries"""
@@ -107,57 +259,70 @@ class ClockifyHandler:
             return "No time entries recorded for this week."
             
         # Group entries by day
-        days = {}
-        total_duration = timedelta()
+        days: Dict[str, Dict] = defaultdict(_new_day_totals)
+        total_duration = 0
         
         for entry in entries:
-            start_time = datetime.fromisoformat(entry["timeInterval"]["start"].replace("Z", "+00:00"))
-            end_time = datetime.fromisoformat(entry["timeInterval"]["end"].replace("Z", "+00:00"))
-            day = start_time.strftime("%A")
-            duration = end_time - start_time
+            # Take the day in the timestamp's own offset; 1970-01-01 was a Thursday
+            start_us, offset_s = _to_epoch(entry["timeInterval"]["start"])
+            day_totals = days[_WEEKDAYS[((start_us // 1_000_000 + offset_s) // 86400 + 3) % 7]]
+            duration = _duration(entry)
             
-            if day not in days:
-                days[day] = {
-                    "total_time": timedelta(),
-                    "projects": {}
-                }
+            project_totals = day_totals["projects"][entry.get("projectName", "No Project")]
             
-            project = entry.get("projectName", "No Project")
-            if project not in days[day]["projects"]:
-                days[day]["projects"][project] = {
-                    "total_time": timedelta(),
-                    "entries": []
-                }
-            
-            days[day]["total_time"] += duration
-            days[day]["projects"][project]["total_time"] += duration
-            days[day]["projects"][project]["entries"].append({
+            day_totals["total_time"] += duration
+            project_totals["total_time"] += duration
+            project_totals["entries"].append({
                 "description": entry.get("description", "No description"),
                 "duration": duration
             })
             total_duration += duration
 
         # Generate markdown report
-        report = "## Weekly Time Report\n\n"
-        report += f"Total time tracked: {self._format_duration(total_duration)}\n\n"
+        parts = [
+            "## Weekly Time Report\n\n",
+            f"Total time tracked: {self._format_duration(total_duration)}\n\n"
+        ]
         
         for day, data in days.items():
-            report += f"### {day}\n"
-            report += f"Total: {self._format_duration(data['total_time'])}\n\n"
+            parts.append(f"### {day}\n")
+            parts.append(f"Total: {self._format_duration(data['total_time'])}\n\n")
             
             for project, proj_data in data["projects"].items():
-                report += f"#### {project}\n"
-                report += f"Total: {self._format_duration(proj_data['total_time'])}\n"
-                report += "Activities:\n"
-                for entry in proj_data["entries"]:
-                    report += f"- {entry['description']} ({self._format_duration(entry['duration'])})\n"
-                report += "\n"
+                parts.append(f"#### {project}\n")
+                parts.append(f"Total: {self._format_duration(proj_data['total_time'])}\n")
+                parts.append("Activities:\n")
+                parts.extend(
+                    f"- {entry['description']} ({self._format_duration(entry['duration'])})\n"
+                    for entry in proj_data["entries"]
+                )
+                parts.append("\n")
             
-        return report
-
-    def _format_duration(self, duration: timedelta) -> str:
-        """Format timedelta into readable string"""
-        total_minutes = duration.total_seconds() / 60
-        hours = int(total_minutes // 60)
-        minutes = int(total_minutes % 60)
-        return f"{hours}h {minutes}m" 
\ No newline at end of file
+        return "".join(parts)
+
+    def _format_duration(self, duration: int) -> str:
+        """Format a duration in microseconds into readable string"""
+        hours, minutes = divmod(duration // 60_000_000, 60)  # Whole minutes, floored
+        return f"{hours}h {minutes}m"
+
+async def get_time_entries_for_many(
+    handlers: List[ClockifyHandler],
+    start_date: datetime,
+    end_date: datetime,
+    max_concurrency: int = 8
+) -> List[List[Dict]]:
+    """Get time entries for several users concurrently, in the same order as handlers
+
+    At most max_concurrency Clockify requests from this call are in flight at
+    once; retry backoff sleeps do not hold a slot. Handlers keep their HTTP
+    clients open for reuse, so callers close them with aclose() when done.
+    """
+    # Passed down to every GET to stay within Clockify's rate limit
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(handler: ClockifyHandler) -> List[Dict]:
+        if not await handler.setup(semaphore):
+            return []
+        return await handler.get_time_entries(start_date, end_date, semaphore)
+
+    return await asyncio.gather(*(fetch(handler) for handler in handlers))